@@ -1,14 +1,79 @@
-from fastapi import FastAPI, HTTPException
+import os
+from functools import lru_cache
+from fastapi import FastAPI, HTTPException, Response
 from pydantic import BaseModel
 from typing import Any, Dict
 import geopandas as gpd
+import orjson
+import shapely
 from shapely.geometry import shape, Polygon, MultiPolygon
 
 # -------------------------------
-# Load GeoJSON file and create spatial index
+# Helper function to read an optional attribute column as Python values
 # -------------------------------
-gdf = gpd.read_file("fields_n_loads.geojson")
-sindex = gdf.sindex  # spatial index for fast queries
+def column_values(df, name: str):
+    if name not in df.columns:
+        return [None] * len(df)
+    return df[name].tolist()
+
+# -------------------------------
+# Helper function to index a fields GeoDataFrame for area queries
+# -------------------------------
+def index_fields(df):
+    geoms = df.geometry.values
+    return {
+        "geoms": geoms,
+        "tree": shapely.STRtree(geoms),
+        # Response columns as plain Python values, so requests only index into them
+        "ids": column_values(df, "id"),
+        "fertilizers": column_values(df, "fertilizer"),
+        "restrictions": column_values(df, "restriction"),
+    }
+
+# -------------------------------
+# Load fields and create spatial index, in this order of precedence:
+# - spatially partitioned Parquet dataset in fields_part/ (see src/main.py --partitions):
+#   only the partition bounds are kept in memory, partitions are loaded on demand and
+#   at most PARTITION_CACHE_SIZE of them (env FIELDS_PARTITION_CACHE) stay loaded
+# - otherwise fields_n_loads.parquet, else fields_n_loads.geojson, held fully in memory
+# A leftover fields_part/ therefore wins over a newer fields_n_loads.parquet; the
+# source actually used is printed at startup.
+# -------------------------------
+PARTITIONED_DIR = "fields_part"
+PARTITION_CACHE_SIZE = int(os.environ.get("FIELDS_PARTITION_CACHE", "8"))
+
+def _load_partition(i: int):
+    """Load and index one partition of the partitioned dataset."""
+    return index_fields(ddf.partitions[int(i)].compute())
+
+ddf = None
+if os.path.isdir(PARTITIONED_DIR):
+    import dask_geopandas
+
+    ddf = dask_geopandas.read_parquet(PARTITIONED_DIR)
+    if ddf.spatial_partitions is None:
+        ddf.calculate_spatial_partitions()
+    partition_tree = shapely.STRtree(ddf.spatial_partitions.values)
+    # bounded LRU so cold partitions (and their STRtrees) are evicted
+    load_partition = lru_cache(maxsize=max(1, min(PARTITION_CACHE_SIZE, ddf.npartitions)))(_load_partition)
+    print(f"Loaded fields from {PARTITIONED_DIR}/ ({ddf.npartitions} partitions, up to {load_partition.cache_info().maxsize} cached)")
+else:
+    if os.path.exists("fields_n_loads.parquet"):
+        source = "fields_n_loads.parquet"
+        gdf = gpd.read_parquet(source)
+    else:
+        source = "fields_n_loads.geojson"
+        # pyogrio bulk-reads the features through Arrow instead of per-feature via fiona
+        gdf = gpd.read_file(source, engine="pyogrio", use_arrow=True)
+    fields_index = index_fields(gdf)  # built once at startup, reused by every request
+    print(f"Loaded fields from {source} ({len(gdf)} features)")
+
+def candidate_indexes(polygon):
+    """Return the field indexes that may contain matches for polygon."""
+    if ddf is None:
+        return [fields_index]
+    parts = partition_tree.query(polygon, predicate="intersects")
+    return [load_partition(i) for i in sorted(parts)]
 
 # -------------------------------
 # FastAPI app
@@ -37,27 +102,48 @@ def parse_geojson(geojson: GeoJSONRequest):
 # -------------------------------
 # API endpoint
 # -------------------------------
-@app.post("/check-area")
-def check_area(request: GeoJSONRequest):
-    polygon = parse_geojson(request)
-
-    # Use spatial index to filter possible matches
-    possible_matches_index = list(sindex.intersection(polygon.bounds))
-    possible_matches = gdf.iloc[possible_matches_index]
+@lru_cache(maxsize=1024)
+def query_area(wkb_hex: str):
+    """Return the encoded matches for a geometry given as hex WKB, or None if
+    nothing intersects. Cached so repeated identical polygons skip the query."""
+    polygon = shapely.from_wkb(wkb_hex)
+    # Prepared geometry makes the repeated intersects tests against candidates cheap
+    shapely.prepare(polygon)
 
     results = []
-    for _, row in possible_matches.iterrows():
-        if polygon.intersects(row.geometry):
-            results.append({
-                "id": row.get("id", None),
-                "fertilizer": row.get("fertilizer", None),
-                "restriction": row.get("restriction", None),
-                "geometry": row.geometry.__geo_interface__  # return geometry in GeoJSON format
-            })
+    for index in candidate_indexes(polygon):
+        # Spatial index query with the exact intersects predicate applied in GEOS
+        hits = index["tree"].query(polygon, predicate="intersects")
+        if len(hits) == 0:
+            continue
+
+        # Serialize all hit geometries to GeoJSON in one call and embed them as
+        # pre-encoded fragments, so orjson does not re-encode them
+        geojson_strs = shapely.to_geojson(index["geoms"][hits])
+        ids, fertilizers, restrictions = index["ids"], index["fertilizers"], index["restrictions"]
+        results.extend(
+            {
+                "id": ids[i],
+                "fertilizer": fertilizers[i],
+                "restriction": restrictions[i],
+                "geometry": orjson.Fragment(geom_json)  # return geometry in GeoJSON format
+            }
+            for i, geom_json in zip(hits, geojson_strs)
+        )
 
     if not results:
+        return None
+    return orjson.dumps({"matches": results}, option=orjson.OPT_SERIALIZE_NUMPY)
+
+@app.post("/check-area")
+def check_area(request: GeoJSONRequest):
+    polygon = parse_geojson(request)
+    # canonical key: the same area with another ring start or winding hits the cache
+    content = query_area(shapely.to_wkb(shapely.normalize(polygon), hex=True))
+
+    if content is None:
         return {"message": "No matching area found"}
-    return {"matches": results}
+    return Response(content=content, media_type="application/json")
 
 # -------------------------------
 # Health check endpoint
@@ -1,18 +1,13 @@
 import geopandas as gpd
+import numpy as np
 import pandas as pd
-from shapely.ops import unary_union
-from typing import Tuple
+import shapely
+from typing import Optional, Tuple
 
-def calculate_nitrogen_from_distance(dist_to_water_m):
-    """Calculate the nitrogen requirement based on distance from water body."""
-    if dist_to_water_m >= 3000:  # Example threshold for nitrogen application
-        return 80  # For large distance, apply 80 kg N/ha
-    elif dist_to_water_m >= 2000:
-        return 50  # Medium distance, apply 50 kg N/ha
-    elif dist_to_water_m >= 1000:
-        return 40  # Shorter distance, apply 40 kg N/ha
-    else:
-        return 0  # No nitrogen applied if too close to the water
+# nitrogen application by distance to water: _VALUES[i] kg N/ha applies for
+# _THRESH[i-1] <= distance (m) < _THRESH[i]; no N within 1000 m of water
+_THRESH = np.array([1000.0, 2000.0, 3000.0])
+_VALUES = np.array([0, 40, 50, 80])
 
 def compute_distance_to_water(fields: gpd.GeoDataFrame, water: gpd.GeoDataFrame, crs: str = "EPSG:3857") -> gpd.GeoDataFrame:
     """
@@ -22,35 +17,69 @@ def compute_distance_to_water(fields: gpd.GeoDataFrame, water: gpd.GeoDataFrame,
     if fields.empty or water.empty:
         fields["dist_to_water_m"] = None
         return fields
-    # project to metric CRS for distances
-    fields_m = fields.to_crs(crs)
-    water_m = water.to_crs(crs)
-    water_union = unary_union(list(water_m.geometry))
-    fields_m["dist_to_water_m"] = fields_m.geometry.apply(lambda g: g.distance(water_union))
+    # project to metric CRS for distances (only the geometries are needed;
+    # GeoSeries.to_crs runs one vectorized PROJ pass over all coordinates)
+    field_geoms = fields.geometry.to_crs(crs).values
+    water_geoms = water.geometry.to_crs(crs).values
+    # nearest waterbody per field via an STRtree; no union of all waterbodies needed
+    tree = shapely.STRtree(water_geoms)
+    (field_idx, _), dists = tree.query_nearest(
+        field_geoms, return_distance=True, all_matches=False
+    )
+    dist = np.full(len(fields), np.nan)
+    dist[field_idx] = dists
+
+    # Apply the fertilizer amounts from _THRESH/_VALUES based on distance to water
+    n_amount = _VALUES[np.searchsorted(_THRESH, dist, side="right")]
+    # fields without a distance get no nitrogen
+    n_amount[np.isnan(dist)] = 0
+    columns = {"dist_to_water_m": dist, "fertilizer_amount_N_kg_per_ha": n_amount}
+    # attach results to the original geometries instead of projecting back
+    return fields.assign(**columns)
 
-    # Apply the fertilizer calculation based on distance to water
-    fields_m["fertilizer_amount_N_kg_per_ha"] = fields_m["dist_to_water_m"].apply(calculate_nitrogen_from_distance)
-    return fields_m.to_crs(fields.crs)
+def compute_area_ha(fields: gpd.GeoDataFrame) -> np.ndarray:
+    """
+    Field areas in hectares, measured in the fields' own CRS when it is projected
+    (e.g. EPSG:25832) and in EPSG:3857 otherwise.
+    """
+    if fields.crs is not None and fields.crs.is_projected:
+        return shapely.area(fields.geometry.values) / 10000.0
+    return fields.geometry.to_crs("EPSG:3857").area.to_numpy() / 10000.0
 
-def compute_n_loads(fields: gpd.GeoDataFrame, n_df: pd.DataFrame, runoff_coef: float = 0.1) -> gpd.GeoDataFrame:
+def compute_n_loads(fields: gpd.GeoDataFrame, n_df: pd.DataFrame, runoff_coef: float = 0.1, inplace: bool = False, area_ha: Optional[np.ndarray] = None) -> gpd.GeoDataFrame:
     """
     Estimate nitrogen load to water per field.
-    - fields must have an 'area_ha' column or will be computed from geometry.
+    - area_ha (precomputed, see compute_area_ha) is used if given; otherwise fields'
+      'area_ha' column, otherwise it is computed from geometry.
     - n_df should contain n_kg_per_ha values; we take mean if multiple.
+    - inplace=True adds the columns to `fields` itself; otherwise a new frame is
+      returned that shares the existing columns (no full copy).
     Returns fields with 'n_applied_kg_ha', 'n_total_kg', 'n_estimated_to_water_kg'.
     """
     print("Computing nitrogen loads...")
-    f = fields.copy()
-    if "area_ha" not in f.columns:
-        f["area_ha"] = f.geometry.to_crs("EPSG:3857").area / 10000.0
+    columns = {}
+    if area_ha is not None:
+        area = np.asarray(area_ha, dtype=float)
+        columns["area_ha"] = area
+    elif "area_ha" in fields.columns:
+        area = fields["area_ha"].to_numpy(dtype=float)
+    else:
+        area = compute_area_ha(fields)
+        columns["area_ha"] = area
     if n_df.empty:
-        f["n_applied_kg_ha"] = None
-        f["n_total_kg"] = None
-        f["n_estimated_to_water_kg"] = None
-        return f
-    mean_n = n_df["n_kg_per_ha"].mean()
-    f["n_applied_kg_ha"] = mean_n
-    f["n_total_kg"] = f["n_applied_kg_ha"] * f["area_ha"]
-    # simple model: portion of applied N that reaches water
-    f["n_estimated_to_water_kg"] = f["n_total_kg"] * runoff_coef
-    return f
+        columns["n_applied_kg_ha"] = None
+        columns["n_total_kg"] = None
+        columns["n_estimated_to_water_kg"] = None
+    else:
+        mean_n = float(n_df["n_kg_per_ha"].mean())
+        # scalar * ndarray products; no intermediate Series arithmetic
+        n_total = mean_n * area
+        columns["n_applied_kg_ha"] = mean_n
+        columns["n_total_kg"] = n_total
+        # simple model: portion of applied N that reaches water
+        columns["n_estimated_to_water_kg"] = n_total * runoff_coef
+    if not inplace:
+        return fields.assign(**columns)
+    for name, values in columns.items():
+        fields[name] = values
+    return fields
@@ -1,28 +1,97 @@
+import itertools
 import os
 import re
+from concurrent.futures import ProcessPoolExecutor
 from typing import List, Dict
 import geopandas as gpd
 import pdfplumber
 import pandas as pd
 
+try:
+    import hyperscan
+except ImportError:  # optional: falls back to plain `re` scanning
+    hyperscan = None
+
+# simple regex to find "N" followed by numbers (e.g. "N 120 kg/ha", "N: 80 kg/ha")
+_N_REGEX = re.compile(r"\bN[:\s]*([0-9]{1,4}(?:[.,][0-9]+)?)\s*(?:kg\/ha|kg/ha|kg per ha|kg ha-1)?", re.IGNORECASE)
+
+# Hyperscan prefilter for _N_REGEX: reports the start of every position where
+# _N_REGEX can match (a superset, \b is checked by _N_REGEX itself), so only
+# those positions are handed to `re`.
+_N_PREFILTER = rb"N[:\s\x1c-\x1f]*[0-9]"
+
+def _compile_n_prefilter():
+    if hyperscan is None:
+        return None
+    try:
+        db = hyperscan.Database()
+        db.compile(
+            expressions=[_N_PREFILTER],
+            flags=[hyperscan.HS_FLAG_CASELESS | hyperscan.HS_FLAG_SOM_LEFTMOST | hyperscan.HS_FLAG_UTF8 | hyperscan.HS_FLAG_UCP],
+        )
+        return db
+    except Exception:
+        return None
+
+_N_HS_DB = _compile_n_prefilter()
+
+def _iter_n_matches(text: str):
+    """Yield the same matches as _N_REGEX.finditer(text), using Hyperscan to
+    locate candidate positions when it is installed."""
+    if _N_HS_DB is None:
+        yield from _N_REGEX.finditer(text)
+        return
+    try:
+        data = text.encode("utf-8")
+    except UnicodeEncodeError:
+        # e.g. lone surrogates from broken ToUnicode maps; not valid UTF-8 for Hyperscan
+        yield from _N_REGEX.finditer(text)
+        return
+    starts = []
+    _N_HS_DB.scan(data, match_event_handler=lambda _id, start, _end, _flags, _ctx: starts.append(start))
+    ascii_only = text.isascii()
+    byte_pos = char_pos = end = 0
+    for start in sorted(set(starts)):
+        if not ascii_only:
+            # Hyperscan reports byte offsets; convert to str offsets incrementally
+            char_pos += len(data[byte_pos:start].decode("utf-8"))
+            byte_pos = start
+            start = char_pos
+        if start < end:
+            continue  # overlaps the previous match, as in finditer
+        m = _N_REGEX.match(text, start)
+        if m:
+            end = m.end()
+            yield m
+
+# file extension -> scan_workspace bucket
+_EXT_MAP = {".shp": "shapefiles", ".gpkg": "geopackages", ".geojson": "geojson", ".json": "geojson", ".pdf": "pdfs"}
+
 def scan_workspace(root: str) -> Dict[str, List[str]]:
     """
     Scan workspace root for geo and pdf files. Returns dict with keys:
     'shapefiles', 'geopackages', 'geojson', 'pdfs'.
     """
     out = {"shapefiles": [], "geopackages": [], "geojson": [], "pdfs": []}
-    for dirpath, _, filenames in os.walk(root):
-        for fn in filenames:
-            path = os.path.join(dirpath, fn)
-            lower = fn.lower()
-            if lower.endswith(".shp"):
-                out["shapefiles"].append(path)
-            elif lower.endswith(".gpkg"):
-                out["geopackages"].append(path)
-            elif lower.endswith(".geojson") or lower.endswith(".json"):
-                out["geojson"].append(path)
-            elif lower.endswith(".pdf"):
-                out["pdfs"].append(path)
+    # explicit stack + os.scandir; same top-down order as os.walk
+    stack = [root]
+    while stack:
+        dirpath = stack.pop()
+        subdirs = []
+        try:
+            with os.scandir(dirpath) as it:
+                for entry in it:
+                    if entry.is_dir():
+                        # like os.walk, don't descend into symlinked directories
+                        if not entry.is_symlink():
+                            subdirs.append(entry.path)
+                        continue
+                    bucket = _EXT_MAP.get(os.path.splitext(entry.name)[1].lower())
+                    if bucket is not None:
+                        out[bucket].append(entry.path)
+        except OSError:
+            continue
+        stack.extend(reversed(subdirs))
     return out
 
 def load_first_vector(paths: List[str]) -> gpd.GeoDataFrame:
@@ -42,16 +111,16 @@ def extract_n_from_pdf(pdf_path: str) -> List[Dict]:
     Returns list of records: {'source': pdf_path, 'n_kg_per_ha': float, 'raw': str}
     """
     records = []
+    append = records.append
     try:
         with pdfplumber.open(pdf_path) as pdf:
-            full = "\n".join([p.extract_text() or "" for p in pdf.pages])
+            # scan page by page instead of joining the whole document into one string
+            for page in pdf.pages:
+                for m in _iter_n_matches(page.extract_text() or ""):
+                    val = float(m.group(1).replace(",", "."))
+                    append({"source": pdf_path, "n_kg_per_ha": val, "raw": m.group(0)})
     except Exception:
-        return records
-    # simple regex to find "N" followed by numbers (e.g. "N 120 kg/ha", "N: 80 kg/ha")
-    regex = re.compile(r"\bN[:\s]*([0-9]{1,4}(?:[.,][0-9]+)?)\s*(?:kg\/ha|kg/ha|kg per ha|kg ha-1)?", re.IGNORECASE)
-    for m in regex.finditer(full):
-        val = float(m.group(1).replace(",", "."))
-        records.append({"source": pdf_path, "n_kg_per_ha": val, "raw": m.group(0)})
+        return []
     return records
 
 def load_bewirtschaftungs_docs(folder: str) -> pd.DataFrame:
@@ -59,11 +128,12 @@ def load_bewirtschaftungs_docs(folder: str) -> pd.DataFrame:
     Parse PDFs in the Bewirtschaftungsdokumentation-PDF folder and return a DataFrame
     of N applications.
     """
-    records = []
-    for fn in os.listdir(folder):
-        if fn.lower().endswith(".pdf"):
-            p = os.path.join(folder, fn)
-            records.extend(extract_n_from_pdf(p))
+    pdf_paths = [os.path.join(folder, fn) for fn in os.listdir(folder) if fn.lower().endswith(".pdf")]
+    if not pdf_paths:
+        return pd.DataFrame()
+    # PDFs are independent and parsing is CPU-bound pure Python, so use processes
+    with ProcessPoolExecutor(max_workers=min(len(pdf_paths), os.cpu_count() or 1)) as ex:
+        records = list(itertools.chain.from_iterable(ex.map(extract_n_from_pdf, pdf_paths)))
     return pd.DataFrame(records)
 
 def _find_shapefiles_by_name(shapefiles: List[str], name_hint: str = "WHGGewAbstand_Polygone") -> List[str]:
@@ -94,12 +164,14 @@ def add_whg_geoms_to_fields(
     name_hint: str = "WHGGewAbstand_Polygone",
 ) -> gpd.GeoDataFrame:
     """
-    Attach WHG 'Abstand' polygon geometries to each field row as raw GeoJSON geometry dicts.
+    Load WHG 'Abstand' polygon geometries as a single restrictions layer for the fields.
     Behavior:
-      - Does NOT perform CRS alignment or spatial intersection.
+      - Does NOT perform spatial intersection with the fields.
       - Loads shapefile(s) that match name_hint (or falls back to any provided shapefiles).
-      - Assigns the full list of geometries (as GeoJSON dicts) into column `col_name` for every field row.
-      - If no geometries found, column contains None.
+      - Reprojects each layer to the fields' CRS where possible.
+      - Returns one GeoDataFrame (one row per WHG polygon, plus 'source_file') rather than
+        copying the geometry list into every field row; fields_gdf is not modified.
+      - If no geometries found, returns an empty GeoDataFrame.
     """
     candidates = _find_shapefiles_by_name(shapefile_paths, name_hint=name_hint)
     loaded: List[gpd.GeoDataFrame] = []
@@ -4,7 +4,19 @@ import geopandas as gpd
 import pandas as pd
 import data_loader, analysis
 
-def run_pipeline(root: str, out_dir: str):
+def write_partitioned(fields: gpd.GeoDataFrame, path: str, npartitions: int):
+    """
+    Write fields as a spatially partitioned Parquet dataset (Hilbert-sorted
+    partitions with stored bounds) for app.py to load partition by partition.
+    Requires the optional dask-geopandas dependency.
+    """
+    import dask_geopandas
+
+    ddf = dask_geopandas.from_geopandas(fields, npartitions=npartitions)
+    # overwrite so part files from an earlier run with more partitions are removed
+    ddf.spatial_shuffle().to_parquet(path, overwrite=True)
+
+def run_pipeline(root: str, out_dir: str, write_geojson: bool = True, partitions: int = 0):
     os.makedirs(out_dir, exist_ok=True)
     scan = data_loader.scan_workspace(root)
     print("Found files:", {k: len(v) for k, v in scan.items()})
@@ -32,13 +44,18 @@ def run_pipeline(root: str, out_dir: str):
     # analysis
     if not fields.empty and not waters.empty:
         fields = analysis.compute_distance_to_water(fields, waters)
-    fields = analysis.compute_n_loads(fields, n_df)
+    fields = analysis.compute_n_loads(fields, n_df, inplace=True)
     print("Analysis complete.")
     # save outputs
     out_csv = os.path.join(out_dir, "fields_n_loads.csv")
     fields.drop(columns=["geometry"], errors="ignore").to_csv(out_csv, index=False)
-    out_geo = os.path.join(out_dir, "fields_n_loads.geojson")
-    fields.to_file(out_geo, driver="GeoJSON")
+    out_parquet = os.path.join(out_dir, "fields_n_loads.parquet")
+    fields.to_parquet(out_parquet)
+    if write_geojson:
+        out_geo = os.path.join(out_dir, "fields_n_loads.geojson")
+        fields.to_file(out_geo, driver="GeoJSON")
+    if partitions > 0:
+        write_partitioned(fields, os.path.join(out_dir, "fields_part"), partitions)
     
     out_geo = os.path.join(out_dir, "restrictions.geojson")
     fields_whg.to_file(out_geo, driver="GeoJSON")
@@ -49,5 +66,7 @@ if __name__ == "__main__":
     p = argparse.ArgumentParser()
     p.add_argument("--root", default=".", help="workspace root to scan")
     p.add_argument("--out", default="out", help="output folder")
+    p.add_argument("--no-geojson", action="store_true", help="skip fields_n_loads.geojson (GeoParquet is always written)")
+    p.add_argument("--partitions", type=int, default=0, help="also write a spatially partitioned dataset with this many partitions (needs dask-geopandas)")
     args = p.parse_args()
-    run_pipeline(args.root, args.out)
\ No newline at end of file
+    run_pipeline(args.root, args.out, write_geojson=not args.no_geojson, partitions=args.partitions)
\ No newline at end of file